@@ -18,8 +18,14 @@ import json
 import re
 import sys
 import math
+import mmap
+import os
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 # Directive pattern definitions
 DIRECTIVE_PATTERNS = {
@@ -93,11 +99,136 @@ DIRECTIVE_WEIGHTS = {
     'emphasis': 1.5,         # Emphasized instructions add pressure
 }
 
+# Fixed category order; the scanning hot path keeps per-category counts in lists
+# indexed by position in this tuple and converts to dicts only when returning
+CATEGORIES = tuple(DIRECTIVE_PATTERNS)
+_CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
 
-def extract_text_from_transcript(transcript_path: str) -> Tuple[List[Dict], Dict]:
-    """Extract all text content from a JSONL transcript file with position info."""
-    text_segments = []  # List of {text, position, role} dicts
-    stats = {
+# Sentence-start anchor shared by the imperative patterns
+_SENTENCE_START = r'(?:^|\.\s+)'
+
+
+def _fuse_patterns(patterns: List[str]) -> str:
+    """
+    Join patterns into one alternation, factoring out the sentence-start anchor.
+
+    With the anchor repeated in every branch the regex engine re-tries it for
+    each verb at every position; factored out, it is tried once and only the
+    verbs are alternated, which makes the imperative scan an order of magnitude
+    faster.
+    """
+    anchored = [p[len(_SENTENCE_START):] for p in patterns if p.startswith(_SENTENCE_START)]
+    branches = [p for p in patterns if not p.startswith(_SENTENCE_START)]
+    if anchored:
+        branches.append(_SENTENCE_START + '(?:%s)' % '|'.join(anchored))
+    return '|'.join('(?:%s)' % p for p in branches)
+
+
+# Leading keyword of every pattern (e.g. 'must', 'don', 'ensure'), skipping regex
+# escapes such as \b and \s. Every directive match starts with one of these words,
+# so a single literal search rules out segments (code, logs, tool output) that
+# contain no directives at all, and those skip the per-category scans. A plain
+# literal alternation is much cheaper to search than the union of the full
+# patterns, whose anchors defeat the regex engine's prefix scanning.
+_DIRECTIVE_KEYWORDS = sorted({
+    re.search(r'(?<!\\)[a-z]+', p).group()
+    for patterns in DIRECTIVE_PATTERNS.values() for p in patterns
+})
+_ANY_DIRECTIVE = re.compile(r'\b(?:%s)' % '|'.join(_DIRECTIVE_KEYWORDS))
+
+# Most patterns are a plain word or phrase between word boundaries (optionally
+# with an apostrophe, e.g. don'?t). All of those are found in one pass of a single
+# keyword alternation. Longer keywords are tried first so "must not" wins over
+# "must", and each matched keyword is mapped to every category it counts towards
+# ("must not" is both an obligation and a prohibition), exactly as the individual
+# patterns would count it. The remaining patterns (sentence-start imperatives,
+# "all" with its lookahead) are fused into one alternation per category; patterns
+# within a category never overlap, so the fused match count equals the sum of the
+# individual pattern counts. Text is lowercased once before scanning, which is far
+# cheaper than matching case-insensitively, so nothing is compiled with IGNORECASE.
+_LITERAL_PATTERN = re.compile(r"\\b([a-z' ?]+)\\b")
+_LITERAL_PATTERNS = {}
+_RESIDUAL_PATTERNS = []  # (category index, pattern)
+for _category, _patterns in DIRECTIVE_PATTERNS.items():
+    _literals = [p for p in _patterns if _LITERAL_PATTERN.fullmatch(p)]
+    _residual = [p for p in _patterns if not _LITERAL_PATTERN.fullmatch(p)]
+    if _literals:
+        _LITERAL_PATTERNS[_category] = re.compile('|'.join(_literals))
+    if _residual:
+        _RESIDUAL_PATTERNS.append((
+            _CATEGORY_INDEX[_category],
+            re.compile(_fuse_patterns(_residual), re.MULTILINE),
+        ))
+
+_KEYWORD_SCANNER = re.compile(r'\b(?:%s)\b' % '|'.join(sorted(
+    {_LITERAL_PATTERN.fullmatch(p).group(1)
+     for patterns in DIRECTIVE_PATTERNS.values() for p in patterns if _LITERAL_PATTERN.fullmatch(p)},
+    key=lambda keyword: (-len(keyword), keyword),
+)))
+
+# Matched keyword -> ((category index, count), ...), filled on first sight of each keyword
+_KEYWORD_CATEGORIES = {}
+
+
+def _keyword_categories(keyword: Union[str, bytes]) -> Tuple[Tuple[int, int], ...]:
+    """Categories (and match counts) a keyword found by _KEYWORD_SCANNER counts towards."""
+    increments = _KEYWORD_CATEGORIES.get(keyword)
+    if increments is None:
+        text = keyword.decode() if isinstance(keyword, bytes) else keyword
+        increments = tuple(
+            (_CATEGORY_INDEX[category], len(pattern.findall(text)))
+            for category, pattern in _LITERAL_PATTERNS.items()
+            if pattern.search(text)
+        )
+        _KEYWORD_CATEGORIES[keyword] = increments
+    return increments
+
+
+# Byte-mode counterparts. The regex engine runs tighter loops over bytes than over
+# str, so ASCII text (nearly all of a transcript) is encoded and scanned as bytes;
+# bytes.lower() only folds A-Z, which is all the ASCII patterns need. Text with
+# other characters stays str, where \b and lower() are Unicode-aware, and so does
+# text with the separators \x1c-\x1f, which \s matches in str but not in bytes.
+_ANY_DIRECTIVE_BYTES = re.compile(_ANY_DIRECTIVE.pattern.encode())
+_KEYWORD_SCANNER_BYTES = re.compile(_KEYWORD_SCANNER.pattern.encode())
+_STR_ONLY_WHITESPACE = (b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+_RESIDUAL_BYTE_PATTERNS = [
+    (cat_idx, re.compile(pattern.pattern.encode(), re.MULTILINE))
+    for cat_idx, pattern in _RESIDUAL_PATTERNS
+]
+
+# Stand-in entry for assistant lines skipped without JSON parsing, so their
+# stats are still recorded
+_ASSISTANT_ENTRY = {'role': 'assistant'}
+
+# Total segment text above which directive scans are spread across processes.
+# Below it, worker start-up and pickling the text cost more than the scan saves.
+_PARALLEL_MIN_CHARS = 2_000_000
+
+# On-disk cache of per-transcript counting state. Transcripts are append-only, so
+# a status line refresh only has to analyze the lines added since the last run.
+# Bump the version whenever counting changes.
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'context-helper' / 'analysis.json'
+_CACHE_VERSION = 2
+_CACHE_MAX_ENTRIES = 16
+# Bytes before the stored offset that must be unchanged for the state to be reused
+_CACHE_CHECKSUM_BYTES = 4096
+
+
+def _count_lines(f) -> int:
+    """Count lines in a binary file, including a final line without a newline."""
+    count = 0
+    last_block = b''
+    for block in iter(lambda: f.read(1 << 16), b''):
+        count += block.count(b'\n')
+        last_block = block
+    if last_block and not last_block.endswith(b'\n'):
+        count += 1
+    return count
+
+
+def _new_stats() -> Dict[str, int]:
+    return {
         'total_messages': 0,
         'system_messages': 0,
         'user_messages': 0,
@@ -106,63 +237,132 @@ def extract_text_from_transcript(transcript_path: str) -> Tuple[List[Dict], Dict
         'total_chars': 0,
     }
 
+
+def _is_assistant_line(line: bytes) -> bool:
+    """
+    Whether a raw transcript line is an assistant message, without parsing it.
+
+    Decided by the first "role" key on the line: in both the flat and the
+    nested transcript format that is the message's own role, and quotes inside
+    message text are escaped so they cannot produce a match.
+    """
+    role_at = line.find(b'"role"')
+    return role_at >= 0 and line[role_at + 6:role_at + 24].lstrip(b': \t').startswith(b'"assistant"')
+
+
+def _iter_entries(lines: Iterable[bytes], first_line_idx: int = 0,
+                  batch_size: int = 1024) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (line_idx, entry) for every line that parses as a JSON object.
+
+    Non-blank lines are joined into one JSON array per batch and parsed with a
+    single json.loads() call, which is several times cheaper than a call per
+    line for the many small entries in a transcript. Assistant lines, usually
+    most of the bytes, are not parsed at all: they yield a stand-in entry that
+    only carries their role.
+    """
+    batch = []  # (line_idx, stripped line, or None for a skipped assistant line)
+    for line_idx, line in enumerate(lines, first_line_idx):
+        line = line.strip()
+        if line:
+            batch.append((line_idx, None if _is_assistant_line(line) else line))
+            if len(batch) >= batch_size:
+                yield from _parse_batch(batch)
+                batch = []
+    if batch:
+        yield from _parse_batch(batch)
+
+
+def _parse_batch(batch: List[Tuple[int, Optional[bytes]]]) -> Iterator[Tuple[int, Dict]]:
+    """Parse a batch of (line_idx, line) pairs, line by line if the batch is malformed."""
+    lines = [line for _, line in batch if line is not None]
     try:
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            total_lines = len(lines)
+        entries = json.loads(b'[' + b','.join(lines) + b']')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        entries = None
+
+    # A malformed line breaks the whole array (or, if it is a fragment like
+    # '1, 2', shifts the entries), so fall back to parsing each line on its own
+    if entries is None or len(entries) != len(lines):
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                entries.append(None)
+
+    entries = iter(entries)
+    for line_idx, line in batch:
+        entry = _ASSISTANT_ENTRY if line is None else next(entries)
+        if isinstance(entry, dict):
+            yield line_idx, entry
+
+
+def _entry_segments(entry: Dict, stats: Dict[str, int]) -> List[Tuple[str, str]]:
+    """Return the (role, text) pairs to analyze from one transcript entry, updating stats."""
+    segments = []
+    stats['total_messages'] += 1
+
+    # Handle nested message format (Claude Code transcript format)
+    msg = entry.get('message', entry)
+    if not isinstance(msg, dict):
+        return segments
+    role = msg.get('role', '')
+    content = msg.get('content', '')
+
+    if role == 'system':
+        stats['system_messages'] += 1
+        if isinstance(content, str):
+            segments.append(('system', content))
+        elif isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict) and 'text' in item:
+                    segments.append(('system', item['text']))
+
+    elif role == 'user':
+        stats['user_messages'] += 1
+        if isinstance(content, str):
+            segments.append(('user', content))
+        elif isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict):
+                    if 'text' in item:
+                        segments.append(('user', item['text']))
+                    # Tool results often contain instructions
+                    if item.get('type') == 'tool_result':
+                        stats['tool_results'] += 1
+                        if 'content' in item:
+                            if isinstance(item['content'], str):
+                                segments.append(('user', item['content']))
+
+    elif role == 'assistant':
+        stats['assistant_messages'] += 1
+        # We don't count assistant messages as instructions
+
+    # Only non-empty strings: malformed entries may carry numbers, lists or dicts as text
+    segments = [(role, text) for role, text in segments if isinstance(text, str) and text]
+    stats['total_chars'] += sum(len(text) for _, text in segments)
+    return segments
 
-            for line_idx, line in enumerate(lines):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                    stats['total_messages'] += 1
-
-                    # Calculate relative position (0.0 = start, 1.0 = end)
-                    position = line_idx / max(total_lines - 1, 1) if total_lines > 1 else 0.0
-
-                    # Handle nested message format (Claude Code transcript format)
-                    msg = entry.get('message', entry)
-                    role = msg.get('role', '')
-                    content = msg.get('content', '')
-
-                    def add_segment(text, role, pos):
-                        if text:
-                            text_segments.append({'text': text, 'position': pos, 'role': role})
-                            stats['total_chars'] += len(text)
-
-                    if role == 'system':
-                        stats['system_messages'] += 1
-                        if isinstance(content, str):
-                            add_segment(content, 'system', position)
-                        elif isinstance(content, list):
-                            for item in content:
-                                if isinstance(item, dict) and 'text' in item:
-                                    add_segment(item['text'], 'system', position)
-
-                    elif role == 'user':
-                        stats['user_messages'] += 1
-                        if isinstance(content, str):
-                            add_segment(content, 'user', position)
-                        elif isinstance(content, list):
-                            for item in content:
-                                if isinstance(item, dict):
-                                    if 'text' in item:
-                                        add_segment(item['text'], 'user', position)
-                                    # Tool results often contain instructions
-                                    if item.get('type') == 'tool_result':
-                                        stats['tool_results'] += 1
-                                        if 'content' in item:
-                                            if isinstance(item['content'], str):
-                                                add_segment(item['content'], 'user', position)
-
-                    elif role == 'assistant':
-                        stats['assistant_messages'] += 1
-                        # We don't count assistant messages as instructions
-
-                except json.JSONDecodeError:
-                    continue
+
+def extract_text_from_transcript(transcript_path: str) -> Tuple[List[Dict], Dict]:
+    """Extract all text content from a JSONL transcript file with position info."""
+    text_segments = []  # List of {text, position, role} dicts
+    stats = _new_stats()
+
+    try:
+        with open(transcript_path, 'rb') as f:
+            # Count lines up front so positions can be computed while streaming,
+            # without holding the whole transcript in memory
+            total_lines = _count_lines(f)
+            f.seek(0)
+
+            for line_idx, entry in _iter_entries(f):
+                # Calculate relative position (0.0 = start, 1.0 = end)
+                position = line_idx / max(total_lines - 1, 1) if total_lines > 1 else 0.0
+
+                for role, text in _entry_segments(entry, stats):
+                    text_segments.append({'text': text, 'position': position, 'role': role})
 
     except FileNotFoundError:
         return [], stats
@@ -184,52 +384,139 @@ def position_weight(position: float) -> float:
 
     Returns weight between 0.6 (middle) and 1.0 (edges).
     """
-    # U-shaped curve: weight = 0.6 + 0.4 * (2*|pos - 0.5|)^2
-    distance_from_middle = abs(position - 0.5) * 2  # 0 at middle, 1 at edges
-    return 0.6 + 0.4 * (distance_from_middle ** 2)
+    # U-shaped curve: weight = 0.6 + 0.4 * (2*|pos - 0.5|)^2, expanded to
+    # 0.6 + 1.6 * (pos - 0.5)^2 since squaring makes the abs() redundant
+    offset = position - 0.5
+    return 0.6 + 1.6 * offset * offset
+
+
+def _lower_for_scan(text: str) -> Union[str, bytes]:
+    """Lowercase text for scanning, as bytes when byte patterns match it the same way."""
+    try:
+        text_bytes = text.encode('ascii')
+    except UnicodeEncodeError:
+        return text.lower()
+    # Separate substring checks are memchr-fast, much quicker than a [\x1c-\x1f] regex
+    if any(separator in text_bytes for separator in _STR_ONLY_WHITESPACE):
+        return text.lower()
+    return text_bytes.lower()
+
+
+def _count_segment(text_lower: Union[str, bytes]) -> List[int]:
+    """Count directive patterns per category (in CATEGORIES order) in lowercased text."""
+    counts = [0] * len(CATEGORIES)
+    if isinstance(text_lower, bytes):
+        keyword_scanner, residual_patterns = _KEYWORD_SCANNER_BYTES, _RESIDUAL_BYTE_PATTERNS
+    else:
+        keyword_scanner, residual_patterns = _KEYWORD_SCANNER, _RESIDUAL_PATTERNS
+
+    for keyword in keyword_scanner.findall(text_lower):
+        for cat_idx, match_count in _keyword_categories(keyword):
+            counts[cat_idx] += match_count
+
+    for cat_idx, pattern in residual_patterns:
+        counts[cat_idx] += len(pattern.findall(text_lower))
+
+    return counts
 
 
 def count_directives(text: str) -> Dict[str, int]:
     """Count directive patterns in text."""
-    counts = {}
-    text_lower = text.lower()
+    return dict(zip(CATEGORIES, _count_segment(text.lower())))
 
-    for category, patterns in DIRECTIVE_PATTERNS.items():
-        count = 0
-        for pattern in patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-            count += len(matches)
-        counts[category] = count
 
-    return counts
+def _category_weights() -> List[float]:
+    """Category weights in CATEGORIES order."""
+    return [DIRECTIVE_WEIGHTS.get(category, 1.0) for category in CATEGORIES]
+
+
+def _segment_counts(text: str, cat_weights: List[float]) -> Tuple[Tuple[Tuple[int, int], ...], float]:
+    """A segment's non-zero (category index, count) pairs and its category-weighted count."""
+    text_lower = _lower_for_scan(text)
+    any_directive = _ANY_DIRECTIVE_BYTES if isinstance(text_lower, bytes) else _ANY_DIRECTIVE
+    if not any_directive.search(text_lower):
+        return (), 0.0
+
+    increments = tuple((cat_idx, match_count)
+                       for cat_idx, match_count in enumerate(_count_segment(text_lower)) if match_count)
+    segment_weighted = 0.0
+    for cat_idx, match_count in increments:
+        segment_weighted += match_count * cat_weights[cat_idx]
+    return increments, segment_weighted
+
+
+def _add_segment_counts(text: str, counts: List[int], cat_weights: List[float], seen: Dict) -> float:
+    """
+    Add a segment's directive counts to counts and return its category-weighted count.
+
+    Transcripts repeat text (system prompt fragments, tool result boilerplate),
+    so results are kept in seen and each distinct text is scanned only once.
+    """
+    result = seen.get(text)
+    if result is None:
+        result = seen[text] = _segment_counts(text, cat_weights)
+
+    increments, segment_weighted = result
+    for cat_idx, match_count in increments:
+        counts[cat_idx] += match_count
+    return segment_weighted
+
+
+def _count_directives_serial(text_segments: List[Dict]) -> Tuple[Dict[str, int], float]:
+    """count_directives_with_position() in the current process."""
+    counts = [0] * len(CATEGORIES)
+    position_weighted_total = 0.0
+    cat_weights = _category_weights()
+    seen = {}
+
+    for segment in text_segments:
+        segment_weighted = _add_segment_counts(segment['text'], counts, cat_weights, seen)
+
+        # Position weight is shared by every match in the segment, apply it once.
+        # Prefilter hits like "can" or "have" often match no full pattern, so
+        # only segments that actually contributed need a weight computed.
+        if segment_weighted:
+            position_weighted_total += segment_weighted * position_weight(segment['position'])
+
+    return dict(zip(CATEGORIES, counts)), position_weighted_total
+
+
+def _count_directives_parallel(text_segments: List[Dict], workers: int) -> Tuple[Dict[str, int], float]:
+    """count_directives_with_position() with segment chunks scanned in worker processes."""
+    # A few chunks per worker keeps them busy when segment sizes are uneven
+    chunk_size = -(-len(text_segments) // (workers * 4))
+    chunks = [text_segments[i:i + chunk_size] for i in range(0, len(text_segments), chunk_size)]
+
+    counts = dict.fromkeys(CATEGORIES, 0)
+    position_weighted_total = 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_counts, chunk_weighted in pool.map(_count_directives_serial, chunks):
+            for category, count in chunk_counts.items():
+                counts[category] += count
+            position_weighted_total += chunk_weighted
+
+    return counts, position_weighted_total
 
 
 def count_directives_with_position(text_segments: List[Dict]) -> Tuple[Dict[str, int], float]:
     """
     Count directive patterns with position weighting.
 
+    Large inputs are scanned in parallel across CPU cores.
+
     Returns:
         - counts: raw counts per category
         - position_weighted_total: total weighted by position (higher for start/end)
     """
-    counts = {cat: 0 for cat in DIRECTIVE_PATTERNS.keys()}
-    position_weighted_total = 0.0
-
-    for segment in text_segments:
-        text_lower = segment['text'].lower()
-        pos = segment['position']
-        pos_weight = position_weight(pos)
-
-        for category, patterns in DIRECTIVE_PATTERNS.items():
-            for pattern in patterns:
-                matches = re.findall(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-                match_count = len(matches)
-                counts[category] += match_count
-                # Apply both category weight and position weight
-                cat_weight = DIRECTIVE_WEIGHTS.get(category, 1.0)
-                position_weighted_total += match_count * cat_weight * pos_weight
+    workers = os.cpu_count() or 1
+    if workers > 1 and sum(len(segment['text']) for segment in text_segments) >= _PARALLEL_MIN_CHARS:
+        try:
+            return _count_directives_parallel(text_segments, workers)
+        except (OSError, BrokenProcessPool):
+            # No usable process support (e.g. restricted sandbox): scan serially
+            pass
 
-    return counts, position_weighted_total
+    return _count_directives_serial(text_segments)
 
 
 def calculate_weighted_instructions(counts: Dict[str, int]) -> float:
@@ -309,11 +596,204 @@ def get_accuracy_rating(accuracy: float) -> str:
         return "poor"
 
 
-def analyze_transcript(transcript_path: str, context_tokens: int = 0) -> Dict:
-    """Main analysis function."""
+def _directive_counts(transcript_path: str) -> Tuple[Dict[str, int], float, Dict]:
+    """Count directives in a transcript: (counts, position-weighted total, stats)."""
     text_segments, stats = extract_text_from_transcript(transcript_path)
+    counts, position_weighted = count_directives_with_position(text_segments)
+    return counts, position_weighted, stats
+
+
+def _load_cache(cache_path: Path) -> Dict:
+    """Load cache entries, treating a missing, corrupt or outdated file as empty."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('version') == _CACHE_VERSION and data['entries']
+        if isinstance(entries, dict):
+            return entries
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+
+def _save_cache(cache_path: Path, entries: Dict) -> None:
+    """Write cache entries atomically; failures only cost a future cache miss."""
+    try:
+        cache_dir = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': _CACHE_VERSION, 'entries': entries}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Don't leave a stray temp file behind on every failed refresh
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
 
-    if not text_segments:
+
+def _new_count_state() -> Dict:
+    """
+    Empty incremental counting state for one transcript.
+
+    Positions depend on the final line count, so instead of a weighted total the
+    state keeps the category-weighted count of every line that had matches, and
+    position weights are applied when the state is read.
+    """
+    return {
+        'offset': 0,        # bytes consumed, always at a line boundary
+        'total_lines': 0,   # lines consumed
+        'checksum': 0,      # crc32 of the bytes just before offset
+        'counts': dict.fromkeys(CATEGORIES, 0),
+        'line_weights': [],  # [line_idx, category-weighted count]
+        'stats': _new_stats(),
+    }
+
+
+# Keys a cached state needs before it can be reused; anything else is discarded
+_STATE_KEYS = frozenset(_new_count_state()) | {'size', 'mtime_ns'}
+
+
+def _add_lines(state: Dict, lines: List[bytes]) -> None:
+    """Count directives in raw transcript lines that follow the lines already in state."""
+    counts = [state['counts'][category] for category in CATEGORIES]
+    stats = state['stats']
+    cat_weights = _category_weights()
+    # Only repeats within this batch are deduplicated, so memory stays bounded
+    # while the transcript is streamed
+    seen = {}
+
+    for line_idx, entry in _iter_entries(lines, state['total_lines']):
+        line_weighted = 0.0
+        for _role, text in _entry_segments(entry, stats):
+            line_weighted += _add_segment_counts(text, counts, cat_weights, seen)
+        if line_weighted:
+            state['line_weights'].append([line_idx, line_weighted])
+
+    state['counts'] = dict(zip(CATEGORIES, counts))
+    state['total_lines'] += len(lines)
+
+
+def _consume_lines(f, state: Dict, batch_size: int = 1024) -> bytes:
+    """
+    Add the complete lines from state's offset to the end of f to state.
+
+    Lines are streamed in batches. Returns the final line if it has no trailing
+    newline yet; it is not added to state.
+    """
+    f.seek(state['offset'])
+    batch = []
+    pending = b''
+    for line in f:
+        if not line.endswith(b'\n'):
+            pending = line
+            break
+        batch.append(line)
+        if len(batch) >= batch_size:
+            _add_lines(state, batch)
+            state['offset'] += sum(map(len, batch))
+            batch = []
+    if batch:
+        _add_lines(state, batch)
+        state['offset'] += sum(map(len, batch))
+    return pending
+
+
+def _state_position_weighted(state: Dict) -> float:
+    """Apply position weights to the per-line weighted counts in state."""
+    total_lines = state['total_lines']
+    position_weighted = 0.0
+    for line_idx, line_weighted in state['line_weights']:
+        position = line_idx / max(total_lines - 1, 1) if total_lines > 1 else 0.0
+        position_weighted += line_weighted * position_weight(position)
+    return position_weighted
+
+
+def _tail_checksum(f, offset: int) -> int:
+    """crc32 of the bytes just before offset, to detect rewritten transcripts."""
+    start = max(offset - _CACHE_CHECKSUM_BYTES, 0)
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start))
+
+
+def _cached_directive_counts(transcript_path: str, cache_path: Path) -> Tuple[Dict[str, int], float, Dict]:
+    """
+    _directive_counts(), analyzing only the lines appended since the cached state.
+
+    The cached state is reused when the transcript has only grown since it was
+    stored; a shrunk or rewritten transcript is analyzed from scratch. A final
+    line without a trailing newline may still be being written: it is counted
+    in the result but not stored, and is re-read on the next call.
+    """
+    try:
+        f = open(transcript_path, 'rb')
+    except OSError:
+        return _directive_counts(transcript_path)
+
+    with f:
+        st = os.fstat(f.fileno())
+        key = os.path.abspath(transcript_path)
+        entries = _load_cache(cache_path)
+        state = entries.get(key)
+        if not isinstance(state, dict) or not _STATE_KEYS <= state.keys():
+            state = None
+
+        unchanged = (state is not None and st.st_size == state['size']
+                     and st.st_mtime_ns == state['mtime_ns'])
+        if unchanged:
+            # Read only what the stat described; lines appended since are left for
+            # the next call instead of being taken for one partial line
+            f.seek(state['offset'])
+            pending = f.read(max(st.st_size - state['offset'], 0))
+        else:
+            if (state is None or st.st_size < state['offset'] or st.st_size == state['size']
+                    or _tail_checksum(f, state['offset']) != state['checksum']):
+                state = _new_count_state()
+
+            pending = _consume_lines(f, state)
+            state['checksum'] = _tail_checksum(f, state['offset'])
+
+            # Store the size and mtime from before reading: lines appended while
+            # reading then show up as a change on the next call and are read from
+            # the stored offset, instead of passing for an unchanged transcript
+            state['size'] = st.st_size
+            state['mtime_ns'] = st.st_mtime_ns
+
+            # Re-insert so the most recently analyzed transcripts are kept when trimming
+            entries.pop(key, None)
+            entries[key] = state
+            while len(entries) > _CACHE_MAX_ENTRIES:
+                del entries[next(iter(entries))]
+            _save_cache(cache_path, entries)
+
+        # Partial final line: count it for this result only
+        if pending:
+            state = dict(state, stats=dict(state['stats']),
+                         line_weights=list(state['line_weights']))
+            _add_lines(state, [pending])
+
+    return state['counts'], _state_position_weighted(state), state['stats']
+
+
+def analyze_transcript(transcript_path: str, context_tokens: int = 0,
+                       cache_path: Optional[Path] = None) -> Dict:
+    """
+    Main analysis function.
+
+    If cache_path is given, directive counts for a transcript whose mtime and
+    size are unchanged are read from that file instead of being recomputed.
+    """
+    if cache_path is not None:
+        counts, position_weighted, stats = _cached_directive_counts(transcript_path, cache_path)
+    else:
+        counts, position_weighted, stats = _directive_counts(transcript_path)
+
+    if not stats['total_chars']:
         return {
             'instruction_count': 0,
             'weighted_count': 0.0,
@@ -326,8 +806,6 @@ def analyze_transcript(transcript_path: str, context_tokens: int = 0) -> Dict:
             'stats': stats,
         }
 
-    # Count with position weighting
-    counts, position_weighted = count_directives_with_position(text_segments)
     total = sum(counts.values())
     weighted = calculate_weighted_instructions(counts)
 
@@ -351,6 +829,99 @@ def analyze_transcript(transcript_path: str, context_tokens: int = 0) -> Dict:
     }
 
 
+def analyze_transcript_fast(transcript_path: str, context_tokens: int = 0) -> Dict:
+    """
+    Approximate analysis for the compact status line, without JSON parsing.
+
+    Memory-maps the transcript and runs the directive patterns over the raw
+    bytes of every line that is not an assistant message. JSON keys, escapes and
+    tool metadata are scanned along with the message text, so counts can differ
+    slightly from analyze_transcript(). Only the fields used by the compact
+    status line are returned. Like analyze_transcript(), a transcript with no
+    user or system lines reports the base accuracy whatever the context size.
+    """
+    counts = [0] * len(CATEGORIES)
+    cat_weights = _category_weights()
+    line_weights = []  # (line_idx, category-weighted count) for lines with matches
+    total_lines = 0
+    has_text = False
+
+    try:
+        with open(transcript_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line_idx, line in enumerate(iter(mm.readline, b'')):
+                total_lines += 1
+                if _is_assistant_line(line) or not line.strip():
+                    continue
+                has_text = True
+                # Unescape JSON newlines so line-start anchors and word boundaries apply
+                line = line.lower().replace(b'\\n', b'\n')
+                if not _ANY_DIRECTIVE_BYTES.search(line):
+                    continue
+
+                line_weighted = 0.0
+                for cat_idx, match_count in enumerate(_count_segment(line)):
+                    if match_count:
+                        counts[cat_idx] += match_count
+                        line_weighted += match_count * cat_weights[cat_idx]
+                if line_weighted:
+                    line_weights.append((line_idx, line_weighted))
+    except (OSError, ValueError):
+        # Missing, unreadable or empty (not mappable) transcript
+        pass
+
+    if not has_text:
+        return {
+            'instruction_count': 0,
+            'position_weighted_count': 0.0,
+            'estimated_accuracy': 98.0,
+            'rating': 'excellent',
+            'breakdown': dict.fromkeys(CATEGORIES, 0),
+            'factors': {'instruction_penalty': 0.0, 'context_penalty': 0.0},
+        }
+
+    position_weighted = 0.0
+    for line_idx, line_weighted in line_weights:
+        position = line_idx / max(total_lines - 1, 1) if total_lines > 1 else 0.0
+        position_weighted += line_weighted * position_weight(position)
+
+    accuracy, factors = estimate_accuracy(position_weighted, context_tokens)
+
+    return {
+        'instruction_count': sum(counts),
+        'position_weighted_count': round(position_weighted, 1),
+        'estimated_accuracy': round(accuracy, 1),
+        'rating': get_accuracy_rating(accuracy),
+        'breakdown': dict(zip(CATEGORIES, counts)),
+        'factors': factors,
+    }
+
+
+def analyze_transcript_compact(transcript_path: str, context_tokens: int = 0,
+                               cache_path: Optional[Path] = None) -> Dict:
+    """
+    Analysis for the compact status line, returning only the fields it shows.
+
+    With a cache_path the exact counting state is reused, so a refresh only
+    reads the lines appended since the previous one. Without one, the transcript
+    is scanned with the approximate analyze_transcript_fast().
+    """
+    if cache_path is None:
+        analysis = analyze_transcript_fast(transcript_path, context_tokens)
+        return {key: analysis[key] for key in ('instruction_count', 'estimated_accuracy', 'rating')}
+
+    counts, position_weighted, stats = _cached_directive_counts(transcript_path, cache_path)
+    if not stats['total_chars']:
+        return {'instruction_count': 0, 'estimated_accuracy': 98.0, 'rating': 'excellent'}
+
+    accuracy, _ = estimate_accuracy(position_weighted, context_tokens)
+    return {
+        'instruction_count': sum(counts.values()),
+        'estimated_accuracy': round(accuracy, 1),
+        'rating': get_accuracy_rating(accuracy),
+    }
+
+
 def format_status_line(analysis: Dict, compact: bool = True) -> str:
     """Format analysis for status line display."""
     count = analysis['instruction_count']
@@ -380,8 +951,11 @@ def main():
     parser = argparse.ArgumentParser(description='Analyze Claude Code transcript for instruction count')
     parser.add_argument('transcript', nargs='?', help='Path to transcript JSONL file (or reads from stdin)')
     parser.add_argument('--json', action='store_true', help='Output as JSON')
-    parser.add_argument('--compact', action='store_true', help='Compact status line format')
+    parser.add_argument('--compact', action='store_true',
+                        help='Compact status line format (approximate with --no-cache, skips JSON parsing)')
     parser.add_argument('--status-line', action='store_true', help='Read transcript path from stdin JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-analyze instead of reusing cached results for unchanged transcripts')
 
     args = parser.parse_args()
 
@@ -411,7 +985,11 @@ def main():
             print("Inst:0 Acc:98%")
         return
 
-    analysis = analyze_transcript(transcript_path, context_tokens)
+    cache_path = None if args.no_cache else DEFAULT_CACHE_PATH
+    if args.compact and not args.json:
+        analysis = analyze_transcript_compact(transcript_path, context_tokens, cache_path)
+    else:
+        analysis = analyze_transcript(transcript_path, context_tokens, cache_path)
 
     if args.json:
         print(json.dumps(analysis, indent=2))
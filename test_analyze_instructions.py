@@ -2,9 +2,12 @@
 """Unit tests for analyze_instructions.py"""
 
 import json
+import re
 import tempfile
 import os
 import unittest
+from unittest import mock
+import analyze_instructions
 from analyze_instructions import (
     position_weight,
     count_directives,
@@ -14,6 +17,9 @@ from analyze_instructions import (
     get_accuracy_rating,
     extract_text_from_transcript,
     analyze_transcript,
+    analyze_transcript_fast,
+    analyze_transcript_compact,
+    DIRECTIVE_PATTERNS,
     DIRECTIVE_WEIGHTS,
 )
 
@@ -44,6 +50,13 @@ class TestPositionWeight(unittest.TestCase):
         self.assertAlmostEqual(position_weight(0.25), position_weight(0.75), places=5)
         self.assertAlmostEqual(position_weight(0.1), position_weight(0.9), places=5)
 
+    def test_matches_u_curve_formula(self):
+        """Should equal 0.6 + 0.4 * (2 * |pos - 0.5|)^2 across the range."""
+        for i in range(11):
+            position = i / 10
+            expected = 0.6 + 0.4 * (abs(position - 0.5) * 2) ** 2
+            self.assertAlmostEqual(position_weight(position), expected, places=12)
+
 
 class TestCountDirectives(unittest.TestCase):
     """Tests for count_directives function."""
@@ -85,6 +98,41 @@ class TestCountDirectives(unittest.TestCase):
         counts = count_directives("")
         self.assertEqual(sum(counts.values()), 0)
 
+    def test_overlapping_keywords_count_in_each_category(self):
+        """Phrases like "must not" should count as both obligation and prohibition."""
+        counts = count_directives("You must not. You should not. You shouldn't. You must.")
+        self.assertEqual(counts['modal_obligation'], 3)
+        self.assertEqual(counts['prohibition'], 3)
+
+    def test_matches_individual_patterns(self):
+        """Fused category patterns should count the same as each pattern on its own."""
+        text = ("You must not skip this. Shouldn't you? Do not, don't, can't, cannot. "
+                "All of the above. All done.\nEnsure it works. Make sure. Use it. Do it.")
+        counts = count_directives(text)
+        for category, patterns in DIRECTIVE_PATTERNS.items():
+            expected = sum(len(re.findall(p, text.lower(), re.IGNORECASE | re.MULTILINE))
+                           for p in patterns)
+            self.assertEqual(counts[category], expected, category)
+
+    def test_non_ascii_word_boundaries(self):
+        """Accented letters should still count as part of a word."""
+        segments = [{'text': 'Émust NEVER café. Always.', 'position': 0.0, 'role': 'user'}]
+        counts, _ = count_directives_with_position(segments)
+        self.assertEqual(counts['modal_obligation'], 0)
+        self.assertEqual(counts['prohibition'], 1)
+        self.assertEqual(counts['absolute'], 1)
+
+    def test_ascii_separators_count_as_whitespace(self):
+        """Control separators that regex treats as whitespace should still separate sentences."""
+        segments = [{'text': 'Done. \x1cconfirm it.', 'position': 0.0, 'role': 'user'}]
+        counts, _ = count_directives_with_position(segments)
+        self.assertEqual(counts['imperative'], 1)
+
+    def test_imperatives_only_at_sentence_start(self):
+        """Imperative verbs should count only at the start of a line or sentence."""
+        counts = count_directives("Use tabs. Then use spaces.  Verify it.\ncheck this\n  add that. Undo.")
+        self.assertEqual(counts['imperative'], 3)
+
 
 class TestCountDirectivesWithPosition(unittest.TestCase):
     """Tests for count_directives_with_position function."""
@@ -110,6 +158,54 @@ class TestCountDirectivesWithPosition(unittest.TestCase):
 
         self.assertEqual(start_counts, middle_counts)
 
+    def test_segments_without_directives(self):
+        """Segments with no directive keywords should contribute nothing."""
+        segments = [
+            {'text': 'def f(x):\n    return x + 1', 'position': 0.0, 'role': 'user'},
+            {'text': 'You must do this.', 'position': 1.0, 'role': 'user'},
+        ]
+        counts, weighted = count_directives_with_position(segments)
+        self.assertEqual(sum(counts.values()), 1)
+        self.assertAlmostEqual(weighted, 1.0, places=5)
+
+    def test_weighted_total_combines_category_and_position(self):
+        """Weighted total should be the sum of category weights scaled by position weight."""
+        segments = [
+            {'text': 'You must never skip this. It is critical.', 'position': 0.25, 'role': 'user'},
+        ]
+        counts, weighted = count_directives_with_position(segments)
+        expected = sum(n * DIRECTIVE_WEIGHTS[cat] for cat, n in counts.items()) * position_weight(0.25)
+        self.assertAlmostEqual(weighted, expected, places=5)
+        self.assertAlmostEqual(weighted, (1.0 + 1.2 + 1.5) * 0.7, places=5)
+
+    def test_repeated_segments_count_each_occurrence(self):
+        """Identical segments should each count, weighted by their own position."""
+        segments = [{'text': 'You must do this.', 'position': p, 'role': 'user'} for p in (0.0, 0.5, 1.0)]
+        counts, weighted = count_directives_with_position(segments)
+        self.assertEqual(counts['modal_obligation'], 3)
+        self.assertAlmostEqual(weighted, 1.0 + 0.6 + 1.0, places=5)
+
+    def test_parallel_scan_matches_serial(self):
+        """Scanning across worker processes should give the same totals."""
+        texts = ['You must never skip this.', 'Always test. It is critical.', 'def f(): pass']
+        segments = [{'text': texts[i % 3], 'position': i / 29, 'role': 'user'} for i in range(30)]
+        serial_counts, serial_weighted = count_directives_with_position(segments)
+
+        with mock.patch('analyze_instructions._PARALLEL_MIN_CHARS', 0), \
+                mock.patch('analyze_instructions.os.cpu_count', return_value=2):
+            parallel_counts, parallel_weighted = count_directives_with_position(segments)
+
+        self.assertEqual(parallel_counts, serial_counts)
+        self.assertAlmostEqual(parallel_weighted, serial_weighted, places=6)
+
+    def test_case_insensitive(self):
+        """Should match segments regardless of case."""
+        segments = [{'text': 'You MUST do this. NEVER skip. Ensure It Works.', 'position': 0.0, 'role': 'user'}]
+        counts, _ = count_directives_with_position(segments)
+        self.assertEqual(counts['modal_obligation'], 1)
+        self.assertEqual(counts['prohibition'], 1)
+        self.assertEqual(counts['imperative'], 1)
+
 
 class TestCalculateWeightedInstructions(unittest.TestCase):
     """Tests for calculate_weighted_instructions function."""
@@ -243,6 +339,63 @@ class TestExtractTextFromTranscript(unittest.TestCase):
         self.assertEqual(stats['system_messages'], 1)
         self.assertEqual(stats['user_messages'], 1)
 
+    def test_positions_span_all_lines(self):
+        """Positions should run from 0.0 to 1.0, counting a final line without newline."""
+        lines = [json.dumps({"role": "user", "content": "Message %d" % i}) for i in range(3)]
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(lines))
+            f.flush()
+
+            segments, stats = extract_text_from_transcript(f.name)
+
+        os.unlink(f.name)
+
+        self.assertEqual([s['position'] for s in segments], [0.0, 0.5, 1.0])
+
+    def test_assistant_role_detected_from_raw_line(self):
+        """Assistant lines are skipped unparsed; quoted roles in user text are not mistaken for them."""
+        transcript = [
+            {"message": {"role": "assistant", "content": "You must do this."}},
+            {"message": {"role": "user", "content": 'Send {"role":"assistant"} next.'}},
+            {"role": "assistant", "content": [{"type": "text", "text": "Never."}]},
+        ]
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            for msg in transcript:
+                f.write(json.dumps(msg, separators=(',', ':')) + '\n')
+            f.flush()
+
+            segments, stats = extract_text_from_transcript(f.name)
+
+        os.unlink(f.name)
+
+        self.assertEqual([s['text'] for s in segments], ['Send {"role":"assistant"} next.'])
+        self.assertEqual(stats['total_messages'], 3)
+        self.assertEqual(stats['assistant_messages'], 2)
+        self.assertEqual(stats['user_messages'], 1)
+
+    def test_skips_malformed_lines(self):
+        """Malformed lines should be skipped without shifting other entries."""
+        lines = [
+            json.dumps({"role": "user", "content": "First"}),
+            '{"role": "user", "content": ',
+            '',
+            '1, 2',
+            json.dumps({"role": "user", "content": "Last"}),
+        ]
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+
+            segments, stats = extract_text_from_transcript(f.name)
+
+        os.unlink(f.name)
+
+        self.assertEqual([(s['text'], s['position']) for s in segments], [("First", 0.0), ("Last", 1.0)])
+        self.assertEqual(stats['total_messages'], 2)
+
     def test_handles_missing_file(self):
         """Should return empty results for missing file."""
         segments, stats = extract_text_from_transcript('/nonexistent/path.jsonl')
@@ -298,6 +451,239 @@ class TestAnalyzeTranscript(unittest.TestCase):
         self.assertEqual(result['rating'], 'excellent')
 
 
+class TestAnalyzeTranscriptCache(unittest.TestCase):
+    """Tests for analyze_transcript result caching."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmpdir.name, 'cache', 'analysis.json')
+        self.transcript_path = os.path.join(self.tmpdir.name, 'transcript.jsonl')
+        with open(self.transcript_path, 'w') as f:
+            f.write(json.dumps({"role": "system", "content": "You must always follow these rules."}) + '\n')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_matches_uncached_analysis(self):
+        """Cached and uncached analysis should agree, on a miss and on a hit."""
+        uncached = analyze_transcript(self.transcript_path, context_tokens=100000)
+        miss = analyze_transcript(self.transcript_path, 100000, cache_path=self.cache_path)
+        hit = analyze_transcript(self.transcript_path, 100000, cache_path=self.cache_path)
+
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assertEqual(miss, uncached)
+        self.assertEqual(hit, uncached)
+
+    def test_unchanged_transcript_reuses_cache(self):
+        """An unchanged transcript should be served from the cache file."""
+        analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+
+        self._plant_emphasis_marker()
+
+        result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(result['breakdown']['emphasis'], 100)
+
+    def test_changed_transcript_is_reanalyzed(self):
+        """Appending to the transcript should invalidate the cached counts."""
+        first = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        with open(self.transcript_path, 'a') as f:
+            f.write(json.dumps({"role": "user", "content": "Never skip tests."}) + '\n')
+
+        second = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(second['instruction_count'], first['instruction_count'] + 1)
+
+    def test_compact_analysis_uses_cache(self):
+        """The compact analysis should match the full one and share its cached state."""
+        full = analyze_transcript(self.transcript_path, 100000, cache_path=self.cache_path)
+        compact = analyze_transcript_compact(self.transcript_path, 100000, cache_path=self.cache_path)
+        self.assertEqual(compact, {key: full[key] for key in compact})
+
+        self._plant_emphasis_marker()
+        compact = analyze_transcript_compact(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(compact['instruction_count'], full['instruction_count'] + 100)
+
+    def test_failed_cache_write_leaves_no_temp_file(self):
+        """A cache write that fails should not leave its temp file behind."""
+        with mock.patch('analyze_instructions.os.replace', side_effect=OSError):
+            result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+
+        self.assertEqual(result['instruction_count'], 2)
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_path)), [])
+
+    def _plant_emphasis_marker(self):
+        """Overwrite the cached emphasis count to detect whether the state is reused."""
+        with open(self.cache_path) as f:
+            data = json.load(f)
+        for entry in data['entries'].values():
+            entry['counts']['emphasis'] = 100
+        with open(self.cache_path, 'w') as f:
+            json.dump(data, f)
+
+    def test_appended_lines_are_analyzed_incrementally(self):
+        """Only lines appended since the cached state should be analyzed."""
+        analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self._plant_emphasis_marker()
+        with open(self.transcript_path, 'a') as f:
+            f.write(json.dumps({"role": "user", "content": "This is critical."}) + '\n')
+
+        result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(result['breakdown']['emphasis'], 101)
+
+    def test_incremental_matches_full_analysis(self):
+        """Incremental results should match a full analysis, including positions."""
+        analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        with open(self.transcript_path, 'a') as f:
+            for i in range(4):
+                f.write(json.dumps({"role": "user", "content": "Never skip step %d. Always test." % i}) + '\n')
+            # Final line still being written: no trailing newline yet
+            f.write(json.dumps({"role": "user", "content": "You must finish."}))
+
+        incremental = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(incremental, analyze_transcript(self.transcript_path))
+
+        with open(self.transcript_path, 'a') as f:
+            f.write('\n' + json.dumps({"role": "user", "content": "Do it."}) + '\n')
+
+        incremental = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(incremental, analyze_transcript(self.transcript_path))
+
+    def test_lines_appended_while_reading_are_analyzed(self):
+        """Lines appended during an analysis should be picked up by the next one."""
+        consume_lines = analyze_instructions._consume_lines
+
+        def consume_then_append(f, state):
+            pending = consume_lines(f, state)
+            with open(self.transcript_path, 'a') as out:
+                out.write(json.dumps({"role": "user", "content": "Never skip tests."}) + '\n')
+                out.write(json.dumps({"role": "user", "content": "Always lint."}) + '\n')
+            return pending
+
+        with mock.patch('analyze_instructions._consume_lines', side_effect=consume_then_append):
+            analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+
+        incremental = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(incremental['instruction_count'], 4)
+        self.assertEqual(incremental, analyze_transcript(self.transcript_path))
+
+    def test_lines_appended_after_unchanged_check_are_left_for_next_call(self):
+        """An unchanged transcript should be read only up to the size it was checked at."""
+        with open(self.transcript_path, 'a') as f:
+            f.write(json.dumps({"role": "user", "content": "You must test."}) + '\n')
+        before = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        fstat = os.fstat
+
+        def fstat_then_append(fd):
+            st = fstat(fd)
+            with open(self.transcript_path, 'a') as out:
+                out.write(json.dumps({"role": "user", "content": "Never skip tests."}) + '\n')
+                out.write(json.dumps({"role": "user", "content": "Always lint."}) + '\n')
+            return st
+
+        with mock.patch('analyze_instructions.os.fstat', side_effect=fstat_then_append):
+            during = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(during, before)
+
+        after = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(after['instruction_count'], 5)
+        self.assertEqual(after, analyze_transcript(self.transcript_path))
+
+    def test_rewritten_transcript_is_reanalyzed(self):
+        """A transcript rewritten from scratch should not reuse the cached state."""
+        analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self._plant_emphasis_marker()
+        with open(self.transcript_path, 'w') as f:
+            f.write(json.dumps({"role": "system", "content": "Short and important."}) + '\n')
+            f.write(json.dumps({"role": "user", "content": "Hello there, how are you today?"}) + '\n')
+
+        result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(result['breakdown']['emphasis'], 1)
+        self.assertEqual(result['instruction_count'], 1)
+
+    def test_malformed_cache_entries_are_ignored(self):
+        """Cache files with the right version but malformed entries should be rewritten."""
+        os.makedirs(os.path.dirname(self.cache_path))
+        key = os.path.abspath(self.transcript_path)
+        for entries in ([], {key: 'state'}, {key: {'offset': 0}}):
+            with open(self.cache_path, 'w') as f:
+                json.dump({'version': analyze_instructions._CACHE_VERSION, 'entries': entries}, f)
+
+            result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+            self.assertEqual(result['instruction_count'], 2)
+            with open(self.cache_path) as f:
+                self.assertIn('size', json.load(f)['entries'][key])
+
+    def test_non_string_text_is_skipped(self):
+        """Entries whose text is not a string should be skipped, not crash the cached path."""
+        with open(self.transcript_path, 'a') as f:
+            f.write(json.dumps({"role": "user", "content": [{"type": "text", "text": 5}]}) + '\n')
+            f.write(json.dumps({"role": "user", "content": [{"type": "text", "text": ["must"]}]}) + '\n')
+            f.write(json.dumps({"role": "user", "content": "Never skip tests."}) + '\n')
+
+        result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(result['instruction_count'], 3)
+        self.assertEqual(result, analyze_transcript(self.transcript_path))
+
+    def test_corrupt_cache_is_ignored(self):
+        """A corrupt cache file should be treated as empty and rewritten."""
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as f:
+            f.write('not json')
+
+        result = analyze_transcript(self.transcript_path, cache_path=self.cache_path)
+        self.assertEqual(result['instruction_count'], 2)
+        with open(self.cache_path) as f:
+            self.assertIn('entries', json.load(f))
+
+
+class TestAnalyzeTranscriptFast(unittest.TestCase):
+    """Tests for analyze_transcript_fast function."""
+
+    def test_matches_full_analysis_on_plain_messages(self):
+        """Should agree with the full analysis when messages carry no JSON noise."""
+        transcript = [
+            {"role": "system", "content": "You must always follow these rules.\nEnsure tests pass."},
+            {"role": "assistant", "content": "I must not ignore them. Never."},
+            {"message": {"role": "user", "content": "Don't skip this. It is critical."}},
+        ]
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            for msg in transcript:
+                f.write(json.dumps(msg) + '\n')
+            f.flush()
+
+            fast = analyze_transcript_fast(f.name, context_tokens=100000)
+            full = analyze_transcript(f.name, context_tokens=100000)
+
+        os.unlink(f.name)
+
+        self.assertEqual(fast['breakdown'], full['breakdown'])
+        self.assertEqual(fast['instruction_count'], full['instruction_count'])
+        self.assertEqual(fast['estimated_accuracy'], full['estimated_accuracy'])
+
+    def test_empty_and_missing_transcript(self):
+        """Should report no instructions and base accuracy for files without user or system text."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            f.flush()
+            empty = analyze_transcript_fast(f.name)
+
+        os.unlink(f.name)
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as f:
+            f.write(json.dumps({"role": "assistant", "content": "I must not."}) + '\n')
+            f.flush()
+            assistant_only = analyze_transcript_fast(f.name, context_tokens=100000)
+            compact = analyze_transcript_compact(f.name, context_tokens=100000)
+            full = analyze_transcript(f.name, context_tokens=100000)
+
+        os.unlink(f.name)
+
+        missing = analyze_transcript_fast('/nonexistent/path.jsonl', context_tokens=100000)
+        self.assertEqual(compact['estimated_accuracy'], full['estimated_accuracy'])
+        for result in (empty, missing, assistant_only):
+            self.assertEqual(result['instruction_count'], 0)
+            self.assertEqual(result['estimated_accuracy'], 98.0)
+
+
 class TestIntegration(unittest.TestCase):
     """Integration tests for the full pipeline."""
 